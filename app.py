@@ -5,15 +5,19 @@ This module provides a web interface for the Shopee price tracker,
 allowing users to upload Excel files, track prices, and view results.
 """
 
+import io
 import os
 import logging
+import shutil
 import tempfile
 from datetime import datetime
-from threading import Thread
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import deque
+from threading import Thread, Timer
 from pathlib import Path
 
 try:
-    from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file
+    from flask import Flask, Request, render_template, request, redirect, url_for, flash, session, send_file, jsonify, abort
     from flask_login import LoginManager, login_required, current_user
     from werkzeug.utils import secure_filename
 except ImportError:
@@ -21,7 +25,15 @@ except ImportError:
     print("Flask, Flask-Login and Werkzeug are required. Install them using 'pip install flask flask-login werkzeug'")
     sys.exit(1)
 
-from excel_handler import ExcelHandler
+try:
+    from redis import Redis
+    from rq import Queue, get_current_job
+    from rq.exceptions import NoSuchJobError
+    from rq.job import Job
+except ImportError:
+    Redis = None
+
+from excel_handler import ExcelHandler, finalize_workbook
 from config import load_config_from_excel
 from shopee_scraper import ShopeeScraperPool
 
@@ -32,8 +44,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+class UploadRequest(Request):
+    """Request class that spools uploaded files straight to disk."""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        """Write every uploaded file part to a temporary file in the upload folder."""
+        return tempfile.TemporaryFile("wb+", dir=app.config['UPLOAD_FOLDER'])
+
+
 # Initialize Flask app
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.secret_key = os.environ.get("SESSION_SECRET", "shopee_tracker_secret_key")
 
 # Configure SQLAlchemy
@@ -65,37 +87,135 @@ with app.app_context():
 # Configure upload folder
 UPLOAD_FOLDER = Path(tempfile.gettempdir()) / "shopee_tracker_uploads"
 UPLOAD_FOLDER.mkdir(exist_ok=True)
-ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+ALLOWED_EXTENSIONS = ('.xlsx',)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1MB per read when streaming uploads
 
-# Store background job status
+# Let nginx/apache serve downloads with sendfile(2) when running behind one
+app.config['USE_X_SENDFILE'] = os.environ.get("USE_X_SENDFILE", "").lower() in ("1", "true", "yes")
+
+# Store background job status (only used without a task queue)
 jobs = {}
+MAX_JOB_RESULTS = 200  # Rows of scraped prices kept per job for display
+JOB_RETENTION = 60 * 60  # Seconds a finished job is kept before eviction
+
+# Worker processes for the CPU-bound Excel rewrite at the end of in-process
+# jobs; RQ jobs rewrite the file in their own work horse instead
+xlsx_pool = ProcessPoolExecutor(max_workers=2)
+
+# Configure the task queue; without Redis, jobs run on in-process threads
+REDIS_URL = os.environ.get("REDIS_URL")
+JOB_TIMEOUT = 60 * 60  # 1 hour per Excel file
+
+if REDIS_URL and Redis is not None:
+    redis_conn = Redis.from_url(REDIS_URL)
+    task_queue = Queue(connection=redis_conn)
+    logger.info("Using Redis task queue for background jobs")
+else:
+    if REDIS_URL:
+        logger.warning("REDIS_URL is set but rq/redis are not installed, running jobs in-process")
+    redis_conn = None
+    task_queue = None
 
 
 def allowed_file(filename):
     """Check if the file extension is allowed."""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return filename.lower().endswith(ALLOWED_EXTENSIONS)
 
 
-def process_excel_file(file_path, threads=4):
+def new_job(file_path):
     """
-    Process the Excel file in the background.
+    Create the initial status of a processing job.
     
     Args:
         file_path: Path to the Excel file
-        threads: Number of threads for scraping
+        
+    Returns:
+        Dict containing the job status
     """
-    job_id = os.path.basename(file_path)
-    jobs[job_id] = {
+    return {
         'status': 'running',
         'progress': 0,
         'total': 0,
-        'results': [],
+        # Only the most recent rows are kept for the status page
+        'results': deque(maxlen=MAX_JOB_RESULTS),
         'error': None,
         'output_file': file_path
     }
+
+
+def save_job(job_id, job, rq_job=None):
+    """
+    Publish the status of a job so the web process can read it.
+    
+    Args:
+        job_id: The job ID
+        job: Dict containing the job status
+        rq_job: The RQ job when running on a queue worker
+    """
+    if rq_job is None:
+        jobs[job_id] = job
+        
+        if job['status'] != 'running':
+            timer = Timer(JOB_RETENTION, evict_job, args=(job_id, job))
+            timer.daemon = True
+            timer.start()
+    else:
+        rq_job.meta.update(job)
+        rq_job.save_meta()
+
+
+def evict_job(job_id, job):
+    """
+    Remove a finished job from the in-process job store.
+    
+    Args:
+        job_id: The job ID
+        job: The job status that was scheduled for eviction
+    """
+    # The same file may have been uploaded again since, keep that job
+    if jobs.get(job_id) is job:
+        del jobs[job_id]
+
+
+def get_job(job_id):
+    """
+    Get the status of a job.
+    
+    Args:
+        job_id: The job ID
+        
+    Returns:
+        Dict containing the job status, or None if the job is unknown
+    """
+    if task_queue is None:
+        return jobs.get(job_id)
+    
+    try:
+        return Job.fetch(job_id, connection=redis_conn).meta or None
+    except NoSuchJobError:
+        return None
+
+
+def process_excel_file(file_path, threads=4):
+    """
+    Process the Excel file in the background.
+    
+    Runs either on a daemon thread of the web process or on an RQ worker.
+    
+    Args:
+        file_path: Path to the Excel file
+        threads: Number of threads for scraping
+        
+    Returns:
+        Dict containing the final job status
+    """
+    rq_job = get_current_job() if Redis is not None else None
+    job_id = rq_job.id if rq_job is not None else os.path.basename(file_path)
+    job = new_job(file_path)
+    save_job(job_id, job, rq_job)
     
     try:
         # Load the Excel file
@@ -115,11 +235,12 @@ def process_excel_file(file_path, threads=4):
         )
         logger.info(f"Found {len(products)} products to track")
         
-        if not products:
+        if products.empty:
             raise ValueError("No products found in the Excel file")
         
         # Update job status
-        jobs[job_id]['total'] = len(products)
+        job['total'] = len(products)
+        save_job(job_id, job, rq_job)
         
         # Current date for the column header
         today = datetime.now().strftime("%Y-%m-%d")
@@ -130,49 +251,132 @@ def process_excel_file(file_path, threads=4):
         # Scrape prices
         logger.info(f"Starting price scraping with {threads} threads")
         
-        results = []
-        for i, (index, product) in enumerate(products.items()):
-            link = product['link']
-            var1 = product['var1']
-            var2 = product['var2']
-            
-            try:
-                price = scraper_pool.get_price(link, var1, var2)
-                results.append((index, price))
+        # Submit every product up front so the pool scrapes them concurrently
+        futures = {
+            scraper_pool.submit(product.link, product.var1, product.var2): product
+            for product in products.itertuples(index=False)
+        }
+        
+        prices = {}
+        try:
+            for future in as_completed(futures):
+                product = futures[future]
+                link = product.link
                 
-                # Update job progress
-                jobs[job_id]['progress'] = i + 1
-                jobs[job_id]['results'].append({
-                    'link': link,
-                    'var1': var1 or 'N/A',
-                    'var2': var2 or 'N/A',
-                    'price': price
-                })
-            except Exception as e:
-                logger.error(f"Failed to scrape price for {link}: {e}")
-                results.append((index, None))
-                jobs[job_id]['progress'] = i + 1
+                try:
+                    price = future.result()
+                    prices[product.row] = price
+                    
+                    # Update job progress
+                    job['progress'] += 1
+                    job['results'].append({
+                        'link': link,
+                        'var1': product.var1 or 'N/A',
+                        'var2': product.var2 or 'N/A',
+                        'price': price
+                    })
+                    save_job(job_id, job, rq_job)
+                except Exception as e:
+                    logger.error(f"Failed to scrape price for {link}: {e}")
+                    prices[product.row] = None
+                    job['progress'] += 1
+                    save_job(job_id, job, rq_job)
+        finally:
+            scraper_pool.shutdown()
         
-        # Update Excel with prices and calculate discounts
-        # Write prices
-        excel_handler.write_prices(results, today)
-        logger.info(f"Successfully wrote prices to column: {today}")
+        # Keep the results in sheet order
+        results = [(row, prices[row]) for row in products['row'].tolist()]
         
-        # Calculate discounts
-        excel_handler.calculate_discounts(config.discount_column)
+        # Update Excel with prices and calculate discounts. An RQ job already
+        # has a process of its own; on a web process thread, hand the
+        # CPU-bound rewrite to a worker process so it doesn't hold the GIL
+        if rq_job is not None:
+            finalize_workbook(excel_handler, results, today, config.discount_column)
+        else:
+            xlsx_pool.submit(
+                finalize_workbook, excel_handler, results, today, config.discount_column
+            ).result()
+        logger.info(f"Successfully wrote prices to column: {today}")
         logger.info(f"Successfully calculated discounts in column: {config.discount_column}")
-        
-        # Save the Excel file
-        excel_handler.save()
         logger.info("Successfully saved the Excel file")
         
         # Update job status
-        jobs[job_id]['status'] = 'completed'
+        job['status'] = 'completed'
+        save_job(job_id, job, rq_job)
         
     except Exception as e:
         logger.error(f"Error processing file: {e}")
-        jobs[job_id]['status'] = 'error'
-        jobs[job_id]['error'] = str(e)
+        job['status'] = 'error'
+        job['error'] = str(e)
+        save_job(job_id, job, rq_job)
+    
+    return job
+
+
+def process_queued_file(filename, data, threads=4):
+    """
+    Process an uploaded file on an RQ worker.
+    
+    The worker may run on another host than the web process, so the file
+    is passed in as bytes and written to a folder of its own in the
+    worker's upload folder. The updated file is returned as the job result,
+    which RQ stores in Redis for /download.
+    
+    Args:
+        filename: Name of the uploaded Excel file
+        data: Content of the uploaded Excel file
+        threads: Number of threads for scraping
+        
+    Returns:
+        Content of the updated Excel file, or None if processing failed
+    """
+    job_folder = tempfile.mkdtemp(dir=app.config['UPLOAD_FOLDER'])
+    file_path = os.path.join(job_folder, filename)
+    try:
+        with open(file_path, 'wb') as f:
+            f.write(data)
+        
+        if process_excel_file(file_path, threads)['status'] != 'completed':
+            return None
+        with open(file_path, 'rb') as f:
+            return f.read()
+    finally:
+        shutil.rmtree(job_folder, ignore_errors=True)
+
+
+def start_job(file_path, threads):
+    """
+    Start processing an uploaded file in the background.
+    
+    Args:
+        file_path: Path to the uploaded Excel file
+        threads: Number of threads for scraping
+        
+    Returns:
+        The job ID
+    """
+    if task_queue is not None:
+        # Run on an RQ worker, which does not share this host's upload
+        # folder, so the file travels through Redis with the job. The
+        # initial meta lets /status render while queued
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        rq_job = task_queue.enqueue(
+            process_queued_file, os.path.basename(file_path), data, threads,
+            job_timeout=JOB_TIMEOUT, result_ttl=JOB_RETENTION, meta=new_job(file_path)
+        )
+        job_id = rq_job.id
+        os.remove(file_path)
+    else:
+        thread = Thread(target=process_excel_file, args=(file_path, threads))
+        thread.daemon = True
+        thread.start()
+        job_id = os.path.basename(file_path)
+    
+    # Store job ID in session
+    session['job_id'] = job_id
+    
+    return job_id
 
 
 @app.route('/')
@@ -195,7 +399,7 @@ def upload_file():
         return redirect(url_for('index'))
     
     if not allowed_file(file.filename):
-        flash('Only Excel files (.xlsx, .xls) are allowed', 'error')
+        flash('Only Excel files (.xlsx) are allowed', 'error')
         return redirect(url_for('index'))
     
     threads = int(request.form.get('threads', 4))
@@ -206,28 +410,71 @@ def upload_file():
     # Save the file
     file.save(file_path)
     
-    # Start processing in background
-    thread = Thread(target=process_excel_file, args=(file_path, threads))
-    thread.daemon = True
-    thread.start()
-    
-    # Store job ID in session
-    session['job_id'] = os.path.basename(file_path)
+    start_job(file_path, threads)
     
     return redirect(url_for('status'))
 
 
+@app.route('/upload/stream', methods=['POST'])
+def upload_stream():
+    """
+    Handle a raw file upload.
+    
+    The request body is the Excel file itself (application/octet-stream)
+    and the file name is sent in the X-Filename header. The body is copied
+    to disk in fixed-size chunks without going through the form parser.
+    """
+    filename = secure_filename(request.headers.get('X-Filename', ''))
+    
+    if not filename:
+        return jsonify({'error': 'Missing X-Filename header'}), 400
+    
+    if not allowed_file(filename):
+        return jsonify({'error': 'Only Excel files (.xlsx) are allowed'}), 400
+    
+    threads = int(request.args.get('threads', 4))
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    max_size = app.config['MAX_CONTENT_LENGTH']
+    
+    with tempfile.NamedTemporaryFile(dir=app.config['UPLOAD_FOLDER'], delete=False) as tmp:
+        try:
+            size = 0
+            while True:
+                chunk = request.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                
+                # Abort before the rest of an oversize body is received
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    abort(413)
+                
+                tmp.write(chunk)
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    
+    os.replace(tmp.name, file_path)
+    
+    job_id = start_job(file_path, threads)
+    
+    return jsonify({
+        'job_id': job_id,
+        'download_url': url_for('download_file', job_id=job_id)
+    }), 202
+
+
 @app.route('/status')
 def status():
     """Show job status."""
     job_id = session.get('job_id')
+    job = get_job(job_id) if job_id else None
     
-    if not job_id or job_id not in jobs:
+    if job is None:
         flash('No active job found', 'error')
         return redirect(url_for('index'))
     
-    job = jobs[job_id]
-    
     if job['status'] == 'completed':
         flash('Processing completed successfully!', 'success')
     elif job['status'] == 'error':
@@ -239,18 +486,32 @@ def status():
 @app.route('/download/<job_id>')
 def download_file(job_id):
     """Download processed Excel file."""
-    if job_id not in jobs:
+    job = get_job(job_id)
+    
+    if job is None:
         flash('File not found', 'error')
         return redirect(url_for('index'))
     
-    job = jobs[job_id]
-    
     if job['status'] != 'completed':
         flash('Processing not completed yet', 'error')
         return redirect(url_for('status'))
     
-    return send_file(job['output_file'], as_attachment=True, download_name=os.path.basename(job['output_file']))
+    # Jobs run on an RQ worker return the updated file through Redis
+    output_file = job['output_file']
+    if task_queue is not None:
+        output_file = io.BytesIO(Job.fetch(job_id, connection=redis_conn).return_value())
+    
+    # Conditional responses honor Range and If-None-Match so repeat or
+    # resumed downloads don't resend the whole file
+    return send_file(
+        output_file,
+        as_attachment=True,
+        download_name=os.path.basename(job['output_file']),
+        conditional=True,
+        etag=True,
+        max_age=0
+    )
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
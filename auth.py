@@ -7,8 +7,12 @@ This module handles user authentication in the Shopee Price Tracker application.
 import os
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
 from email_validator import validate_email, EmailNotValidError
+from sqlalchemy import or_
+from sqlalchemy.orm import load_only
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 
 from models import db, User
 
@@ -19,6 +23,31 @@ auth = Blueprint('auth', __name__)
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 
+# Argon2id runs the KDF in C instead of werkzeug's PBKDF2 loop
+password_hasher = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=2)
+
+def hash_password(password):
+    """Hash a password with Argon2id."""
+    return password_hasher.hash(password)
+
+def verify_password(password_hash, password):
+    """
+    Check a password against a stored hash.
+    
+    Hashes created by werkzeug before the switch to Argon2 are still accepted.
+    """
+    if not password_hash.startswith('$argon2'):
+        return check_password_hash(password_hash, password)
+    
+    try:
+        return password_hasher.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+def password_needs_rehash(password_hash):
+    """Check if a stored hash should be replaced with one using the current parameters."""
+    return not password_hash.startswith('$argon2') or password_hasher.check_needs_rehash(password_hash)
+
 @login_manager.user_loader
 def load_user(user_id):
     """Load user from database."""
@@ -53,17 +82,21 @@ def register():
             flash(f'Email không hợp lệ: {str(e)}', 'error')
             return render_template('auth/register.html')
         
-        # Check if username or email already exists
-        if User.query.filter_by(username=username).first():
+        # Check if username or email already exists in a single query
+        existing = db.session.query(User.username, User.email).filter(
+            or_(User.username == username, User.email == email)
+        ).all()
+        
+        if any(row.username == username for row in existing):
             flash('Tên người dùng đã tồn tại', 'error')
             return render_template('auth/register.html')
         
-        if User.query.filter_by(email=email).first():
+        if any(row.email == email for row in existing):
             flash('Email đã được sử dụng', 'error')
             return render_template('auth/register.html')
         
         # Create new user
-        password_hash = generate_password_hash(password)
+        password_hash = hash_password(password)
         new_user = User(username=username, email=email, password_hash=password_hash)
         
         try:
@@ -92,11 +125,19 @@ def login():
             flash('Vui lòng nhập tên người dùng và mật khẩu', 'error')
             return render_template('auth/login.html')
         
-        # Find user by username
-        user = User.query.filter_by(username=username).first()
+        # Find user by username, loading only the columns needed to log in
+        user = User.query.options(load_only(User.id, User.password_hash)).filter_by(username=username).first()
         
         # Check if user exists and password is correct
-        if user and check_password_hash(user.password_hash, password):
+        if user and verify_password(user.password_hash, password):
+            # Upgrade legacy werkzeug hashes now that the password is known
+            if password_needs_rehash(user.password_hash):
+                user.password_hash = hash_password(password)
+                try:
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+            
             login_user(user, remember=remember)
             next_page = request.args.get('next')
             return redirect(next_page or url_for('index'))
@@ -137,12 +178,12 @@ def change_password():
             return render_template('auth/change_password.html')
         
         # Check current password
-        if not check_password_hash(current_user.password_hash, current_password):
+        if not verify_password(current_user.password_hash, current_password):
             flash('Mật khẩu hiện tại không đúng', 'error')
             return render_template('auth/change_password.html')
         
         # Update password
-        current_user.password_hash = generate_password_hash(new_password)
+        current_user.password_hash = hash_password(new_password)
         
         try:
             db.session.commit()
@@ -6,6 +6,7 @@ including loading configuration from the Excel file.
 """
 
 import logging
+import re
 from dataclasses import dataclass
 from typing import Dict, Optional
 
@@ -19,6 +20,9 @@ DEFAULT_VAR1_COLUMN = "B"
 DEFAULT_VAR2_COLUMN = "C"
 DEFAULT_DISCOUNT_COLUMN = "D"
 
+# Matches one key=value pair of a configuration cell
+CONFIG_PAIR_RE = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)\s*=\s*([^;]*)')
+
 
 @dataclass
 class Config:
@@ -53,17 +57,10 @@ def parse_config_cell(value: str) -> Dict[str, str]:
     if not value or not isinstance(value, str):
         return {}
     
-    result = {}
-    parts = value.split(';')
-    
-    for part in parts:
-        if '=' not in part:
-            continue
-        
-        key, val = part.split('=', 1)
-        result[key.strip().lower()] = val.strip()
-    
-    return result
+    return {
+        match.group(1).lower(): match.group(2).strip()
+        for match in CONFIG_PAIR_RE.finditer(value)
+    }
 
 
 def load_config_from_excel(excel: ExcelHandler) -> Config:
@@ -81,10 +78,10 @@ def load_config_from_excel(excel: ExcelHandler) -> Config:
     # Try to get configuration from the first row
     config_dict = {}
     
-    # Check cells A1, B1, C1, etc. for configuration
-    for col_idx in range(10):  # Check first 10 columns
-        col_letter = excel.column_index_to_letter(col_idx)
-        cell_value = excel.get_column_value(1, col_letter)
+    # Check cells A1, B1, C1, etc. for configuration in a single row read
+    row = excel.get_row(1)
+    for value in row[:10]:  # Check first 10 columns
+        cell_value = str(value or "").strip()
         
         if cell_value:
             parsed = parse_config_cell(cell_value)
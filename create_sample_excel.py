@@ -6,6 +6,7 @@ the Shopee Price Tracker application.
 """
 
 import pandas as pd
+import xlsxwriter
 from datetime import datetime, timedelta
 import os
 
@@ -119,9 +120,16 @@ config_df = pd.DataFrame([["link_column=A;var1_column=B;var2_column=C;discount_c
 # Combine configuration row with product data
 final_df = pd.concat([config_df, df_products], ignore_index=True)
 
-# Write to Excel
+# Write to Excel row by row; constant_memory flushes each row as soon as the
+# next one starts, so memory stays flat however many products there are.
+# pandas' to_excel writes column by column, which constant_memory can't handle.
 filename = "shopee_sample.xlsx"
-final_df.to_excel(filename, index=False)
+workbook = xlsxwriter.Workbook(filename, {"constant_memory": True})
+worksheet = workbook.add_worksheet()
+worksheet.write_row(0, 0, final_df.columns)
+for row_idx, row in enumerate(final_df.itertuples(index=False), start=1):
+    worksheet.write_row(row_idx, 0, row)
+workbook.close()
 
 print(f"Sample Excel file created at: {filename}")
 print("This file can be used with the Shopee Price Tracker application.")
@@ -6,18 +6,265 @@ reading product links, writing prices, and calculating discounts.
 """
 
 import logging
+import os
+import re
 import string
-from datetime import datetime
+import zipfile
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 import openpyxl
-from openpyxl.styles import Font, PatternFill
-from openpyxl.utils import get_column_letter
+from openpyxl.styles import Font, NamedStyle, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.reader.excel import SUPPORTED_FORMATS
+from openpyxl.utils import column_index_from_string, get_column_letter
+from python_calamine import CalamineWorkbook
+
+from utils import compute_discounts
 
 logger = logging.getLogger(__name__)
 
+# Named styles for discount cells, registered once per saved workbook
+POSITIVE_DISCOUNT_STYLE = "disc_pos"  # Green
+NEGATIVE_DISCOUNT_STYLE = "disc_neg"  # Red
+
+# Active sheet index stored in the workbook view of xl/workbook.xml
+ACTIVE_TAB_RE = re.compile(r'<(?:\w+:)?workbookView\b[^>]*\bactiveTab="(\d+)"')
+
+# Header of a price column (YYYY-MM-DD)
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# Formula element of a cell in a worksheet XML part
+FORMULA_TAG_RE = re.compile(rb"<(?:\w+:)?f[\s>/]")
+
+
+class ExcelReader:
+    """Class for reading cell values from an Excel file."""
+    
+    def __init__(self, filepath: str):
+        """
+        Initialize the Excel reader.
+        
+        Args:
+            filepath: Path to the Excel file
+        """
+        self.filepath = filepath
+    
+    def read(self) -> Tuple[List[Tuple[str, List[list]]], int]:
+        """
+        Read the values of every worksheet in the file.
+        
+        Values are decoded by the Rust-based calamine parser, which is
+        considerably faster than parsing the sheet XML with openpyxl.
+        
+        Returns:
+            Tuple containing a list of (sheet_title, rows) pairs and the
+            index of the active sheet. Rows are plain lists of cell values.
+        """
+        workbook = CalamineWorkbook.from_path(self.filepath)
+        try:
+            sheets = []
+            for sheet_name in workbook.sheet_names:
+                sheet = workbook.get_sheet_by_name(sheet_name)
+                # Keep the leading empty area so row/column positions match Excel
+                rows = sheet.to_python(skip_empty_area=False)
+                sheets.append((sheet_name, [self._normalize_row(row) for row in rows]))
+        finally:
+            workbook.close()
+        
+        active_index = self._get_active_index()
+        if active_index >= len(sheets):
+            active_index = 0
+        
+        return sheets, active_index
+    
+    @staticmethod
+    def _normalize_row(row: list) -> list:
+        """
+        Convert calamine cell values to the values openpyxl would return.
+        
+        Args:
+            row: The row values returned by calamine
+            
+        Returns:
+            The row with empty cells as None and whole numbers as int
+        """
+        values = []
+        for value in row:
+            if value == "":
+                value = None
+            elif isinstance(value, float) and value.is_integer():
+                value = int(value)
+            values.append(value)
+        return values
+    
+    def _get_active_index(self) -> int:
+        """
+        Get the index of the active sheet.
+        
+        calamine does not expose the active sheet, so it is read from the
+        workbook view in xl/workbook.xml.
+        
+        Returns:
+            The index of the active sheet
+        """
+        try:
+            with zipfile.ZipFile(self.filepath) as archive:
+                workbook_xml = archive.read("xl/workbook.xml").decode("utf-8", "ignore")
+        except (zipfile.BadZipFile, KeyError):
+            return 0
+        
+        match = ACTIVE_TAB_RE.search(workbook_xml)
+        return int(match.group(1)) if match else 0
+    
+    def read_formulas(self) -> Dict[int, Dict[Tuple[int, int], object]]:
+        """
+        Read the formulas of every worksheet in the file.
+        
+        calamine only returns the cached result of a formula cell, so the
+        formulas are read separately to be written back on save. The sheet
+        XML is scanned for formula elements first, and openpyxl is only
+        used to parse the workbooks that contain any.
+        
+        Returns:
+            Dict mapping each sheet index to the formulas of that sheet,
+            keyed by (row, col) with 1-based rows and 0-based columns
+        """
+        try:
+            with zipfile.ZipFile(self.filepath) as archive:
+                has_formulas = any(
+                    FORMULA_TAG_RE.search(archive.read(name))
+                    for name in archive.namelist()
+                    if name.startswith("xl/worksheets/") and name.endswith(".xml")
+                )
+        except zipfile.BadZipFile:
+            logger.warning(f"Cannot read formulas from non-xlsx file: {self.filepath}")
+            return {}
+        
+        if not has_formulas:
+            return {}
+        
+        formulas: Dict[int, Dict[Tuple[int, int], object]] = {}
+        workbook = openpyxl.load_workbook(self.filepath, read_only=True, data_only=False)
+        try:
+            for sheet_idx, sheet in enumerate(workbook.worksheets):
+                sheet_formulas = {}
+                for row in sheet.iter_rows():
+                    for cell in row:
+                        if cell.data_type == "f":
+                            sheet_formulas[(cell.row, cell.column - 1)] = cell.value
+                if sheet_formulas:
+                    formulas[sheet_idx] = sheet_formulas
+        finally:
+            workbook.close()
+        
+        return formulas
+
+
+class ExcelWriter:
+    """Class for writing cell values to an Excel file."""
+    
+    def __init__(self, filepath: str):
+        """
+        Initialize the Excel writer.
+        
+        Args:
+            filepath: Path to the Excel file
+        """
+        self.filepath = filepath
+    
+    def write(
+        self,
+        sheets: List[Tuple[str, List[list]]],
+        active_index: int = 0,
+        cell_updates: Optional[Dict[Tuple[int, int], object]] = None,
+        cell_styles: Optional[Dict[Tuple[int, int], str]] = None,
+        named_styles: Optional[List[NamedStyle]] = None,
+        formulas: Optional[Dict[int, Dict[Tuple[int, int], object]]] = None,
+    ):
+        """
+        Write the worksheets to the file.
+        
+        The workbook is created in write-only mode and every row is flushed
+        as soon as it is appended, so only one row is held at a time.
+        
+        Args:
+            sheets: List of (sheet_title, rows) pairs
+            active_index: Index of the sheet to mark as active
+            cell_updates: Values for the active sheet keyed by (row, col),
+                with 1-based rows and 0-based columns
+            cell_styles: Named style names for the active sheet keyed by (row, col)
+            named_styles: Named styles to register in the workbook
+            formulas: Formulas keyed by sheet index, then by (row, col), as
+                returned by ExcelReader.read_formulas; written in place of
+                the cached cell values
+        """
+        cell_updates = cell_updates or {}
+        formulas = formulas or {}
+        
+        # Group the styles by row so each row is patched in a single pass
+        styles_by_row = self._group_by_row(cell_styles or {})
+        
+        workbook = openpyxl.Workbook(write_only=True)
+        for named_style in named_styles or []:
+            workbook.add_named_style(named_style)
+        
+        for sheet_idx, (title, rows) in enumerate(sheets):
+            sheet = workbook.create_sheet(title)
+            
+            # Formulas replace their cached values; updates win over both
+            patches_by_row = self._group_by_row(formulas.get(sheet_idx, {}))
+            sheet_styles: Dict[int, Dict[int, str]] = {}
+            if sheet_idx == active_index:
+                for row_idx, values in self._group_by_row(cell_updates).items():
+                    patches_by_row.setdefault(row_idx, {}).update(values)
+                sheet_styles = styles_by_row
+            
+            if not patches_by_row and not sheet_styles:
+                for row in rows:
+                    sheet.append(row)
+                continue
+            
+            last_row = max([len(rows)] + list(patches_by_row))
+            for row_idx in range(1, last_row + 1):
+                row = list(rows[row_idx - 1]) if row_idx <= len(rows) else []
+                
+                for col_idx, value in patches_by_row.get(row_idx, {}).items():
+                    if col_idx >= len(row):
+                        row.extend([None] * (col_idx + 1 - len(row)))
+                    row[col_idx] = value
+                
+                for col_idx, style in sheet_styles.get(row_idx, {}).items():
+                    if col_idx < len(row):
+                        cell = WriteOnlyCell(sheet, value=row[col_idx])
+                        cell.style = style
+                        row[col_idx] = cell
+                
+                sheet.append(row)
+        
+        if sheets:
+            workbook.active = active_index
+        
+        workbook.save(self.filepath)
+    
+    @staticmethod
+    def _group_by_row(cells: Dict[Tuple[int, int], object]) -> Dict[int, Dict[int, object]]:
+        """
+        Group cell values by row.
+        
+        Args:
+            cells: Values keyed by (row, col)
+            
+        Returns:
+            Dict mapping each row to its values keyed by column
+        """
+        by_row: Dict[int, Dict[int, object]] = {}
+        for (row_idx, col_idx), value in cells.items():
+            by_row.setdefault(row_idx, {})[col_idx] = value
+        return by_row
+
 
 class ExcelHandler:
     """Class for handling Excel operations."""
@@ -29,15 +276,56 @@ class ExcelHandler:
         Args:
             filepath: Path to the Excel file
         """
+        # calamine also reads .xls, but the file is saved back to the same
+        # path as OOXML, so only accept the formats openpyxl writes
+        if Path(filepath).suffix.lower() not in SUPPORTED_FORMATS:
+            raise ValueError(
+                f"Unsupported file format: {filepath}. "
+                f"Supported formats are: {', '.join(SUPPORTED_FORMATS)}"
+            )
+        
         self.filepath = filepath
-        self.workbook = openpyxl.load_workbook(filepath)
-        self.sheet = self.workbook.active
+        reader = ExcelReader(filepath)
+        self.sheets, self.active_index = reader.read()
+        self.formulas = reader.read_formulas()
+        
+        # Raw cell values of the active sheet, one list per row
+        self.rows = self.sheets[self.active_index][1] if self.sheets else []
+        
+        # Build the DataFrame from the values already read, using the
+        # first row as the header like pd.read_excel does
+        header = self.rows[0] if self.rows else []
+        columns = [
+            value if value is not None else f"Unnamed: {col_idx}"
+            for col_idx, value in enumerate(header)
+        ]
+        self.df = pd.DataFrame(self.rows[1:], columns=columns)
+        
+        # Map header text to column indices, keeping the first of any duplicates
+        self._col_index: Dict[str, int] = {}
+        for col_idx, col_name in enumerate(columns):
+            self._col_index.setdefault(str(col_name), col_idx)
+        
+        # Indices of the price (date) columns
+        self._date_col_indices: List[int] = [
+            col_idx for col_idx, col_name in enumerate(columns)
+            if DATE_RE.match(str(col_name))
+        ]
         
-        # Load the data with pandas for easier data manipulation
-        self.df = pd.read_excel(filepath)
+        # Cell writes are buffered until save, since the write-only
+        # workbook cannot be modified after a row has been appended
+        self._cell_updates: Dict[Tuple[int, int], object] = {}
+        self._cell_styles: Dict[Tuple[int, int], str] = {}
         
-        # Cache column letters
+        # Styles for discount cells, shared by every formatted cell
+        self._named_styles = [
+            NamedStyle(name=POSITIVE_DISCOUNT_STYLE, font=Font(color="00AA00")),
+            NamedStyle(name=NEGATIVE_DISCOUNT_STYLE, font=Font(color="AA0000")),
+        ]
+        
+        # Cache column letters and the indices they map to
         self._column_cache = {}
+        self._column_index_cache = {}
     
     def column_index_to_letter(self, index: int) -> str:
         """
@@ -66,12 +354,13 @@ class ExcelHandler:
         Returns:
             The column index (0-based)
         """
+        if letter in self._column_index_cache:
+            return self._column_index_cache[letter]
+        
         # Handle both single letters and letter combinations
-        letter = letter.upper()
-        result = 0
-        for char in letter:
-            result = result * 26 + (ord(char) - ord('A') + 1)
-        return result - 1
+        index = column_index_from_string(letter.upper()) - 1
+        self._column_index_cache[letter] = index
+        return index
     
     def get_column_value(self, row: int, col: Union[str, int]) -> str:
         """
@@ -84,15 +373,40 @@ class ExcelHandler:
         Returns:
             The cell value as a string
         """
-        if isinstance(col, int):
-            col = self.column_index_to_letter(col)
+        col_idx = col if isinstance(col, int) else self.column_letter_to_index(col)
+        
+        if (row, col_idx) in self._cell_updates:
+            value = self._cell_updates[(row, col_idx)]
+        elif row <= len(self.rows) and col_idx < len(self.rows[row - 1]):
+            value = self.rows[row - 1][col_idx]
+        else:
+            value = None
+        
+        return str(value or "").strip()
+    
+    def get_row(self, row: int) -> Tuple:
+        """
+        Get all values of a specific row.
+        
+        Args:
+            row: The row number (1-based)
+            
+        Returns:
+            Tuple of the cell values in the row
+        """
+        values = list(self.rows[row - 1]) if row <= len(self.rows) else []
+        
+        for (update_row, col_idx), value in self._cell_updates.items():
+            if update_row == row:
+                if col_idx >= len(values):
+                    values.extend([None] * (col_idx + 1 - len(values)))
+                values[col_idx] = value
         
-        cell = self.sheet[f"{col}{row}"]
-        return str(cell.value or "").strip()
+        return tuple(values)
     
     def get_product_links_and_variations(
         self, link_col: str, var1_col: str, var2_col: str
-    ) -> Dict[int, Dict[str, str]]:
+    ) -> pd.DataFrame:
         """
         Extract product links and variations from the Excel file.
         
@@ -102,45 +416,48 @@ class ExcelHandler:
             var2_col: The column letter containing the second variation
             
         Returns:
-            Dict mapping row indices to product information
+            DataFrame with one product per row and the columns row (the
+            Excel row number), link, var1 and var2
         """
-        products = {}
+        columns = ["row", "link", "var1", "var2"]
         
         # Convert column letters to numerical indices (0-based)
         link_col_idx = self.column_letter_to_index(link_col)
         var1_col_idx = self.column_letter_to_index(var1_col) if var1_col else None
         var2_col_idx = self.column_letter_to_index(var2_col) if var2_col else None
         
-        # Get the column names from DataFrame (may be different from Excel column letters)
-        df_columns = list(self.df.columns)
-        if link_col_idx >= len(df_columns):
-            return {}  # Invalid column
-            
-        link_col_name = df_columns[link_col_idx]
-        var1_col_name = df_columns[var1_col_idx] if var1_col_idx is not None and var1_col_idx < len(df_columns) else None
-        var2_col_name = df_columns[var2_col_idx] if var2_col_idx is not None and var2_col_idx < len(df_columns) else None
-        
-        # Skip the first row (configuration row)
-        for row_idx, row in self.df.iloc[1:].iterrows():
-            # Get the actual Excel row number (add 3 because: 1-based indexing + config row + header row)
-            excel_row = row_idx + 3
-            
-            # Get the product link
-            link = str(row.get(link_col_name, "")).strip()
-            if not link or "shopee" not in str(link).lower():
-                continue
-            
-            # Get the variations
-            var1 = str(row.get(var1_col_name, "")).strip() if var1_col_name else ""
-            var2 = str(row.get(var2_col_name, "")).strip() if var2_col_name else ""
-            
-            products[excel_row] = {
-                "link": link,
-                "var1": var1,
-                "var2": var2
-            }
+        num_columns = len(self.df.columns)
+        if link_col_idx >= num_columns:
+            return pd.DataFrame(columns=columns)  # Invalid column
         
-        return products
+        # Keep only rows linking to Shopee, skipping the first row (configuration row)
+        links = self._column_text(link_col_idx)
+        mask = links.str.lower().str.contains("shopee", regex=False).to_numpy()
+        
+        empty = pd.Series("", index=links.index)
+        var1 = self._column_text(var1_col_idx) if var1_col_idx is not None and var1_col_idx < num_columns else empty
+        var2 = self._column_text(var2_col_idx) if var2_col_idx is not None and var2_col_idx < num_columns else empty
+        
+        return pd.DataFrame({
+            # Get the actual Excel row number (add 2 because: 1-based indexing + header row)
+            "row": links.index.to_numpy()[mask] + 2,
+            "link": links.to_numpy()[mask],
+            "var1": var1.to_numpy()[mask],
+            "var2": var2.to_numpy()[mask],
+        }, columns=columns)
+    
+    def _column_text(self, col_idx: int) -> pd.Series:
+        """
+        Get the stripped text of a column below the configuration row.
+        
+        Args:
+            col_idx: The column index (0-based)
+            
+        Returns:
+            Series of cell values as strings, with empty cells as ""
+        """
+        column = self.df.iloc[1:, col_idx]
+        return column.where(column.notna(), "").astype(str).str.strip()
     
     def find_or_create_date_column(self, date_str: str) -> int:
         """
@@ -153,19 +470,21 @@ class ExcelHandler:
             The column index
         """
         # Look for existing column with this date
-        for col_idx, col_name in enumerate(self.df.columns):
-            if col_name == date_str:
-                return col_idx
+        col_idx = self._col_index.get(date_str)
+        if col_idx is not None:
+            return col_idx
         
         # Column doesn't exist, find the last column
         last_col_idx = len(self.df.columns)
         
-        # Add the date column to the DataFrame
-        self.df[date_str] = None
+        # Add the date column to the DataFrame as float so prices assign in place
+        self.df[date_str] = np.nan
+        self._col_index[date_str] = last_col_idx
+        if DATE_RE.match(date_str):
+            self._date_col_indices.append(last_col_idx)
         
         # Update the Excel sheet with the new column header
-        col_letter = self.column_index_to_letter(last_col_idx)
-        self.sheet[f"{col_letter}1"] = date_str
+        self._cell_updates[(1, last_col_idx)] = date_str
         
         return last_col_idx
     
@@ -179,16 +498,21 @@ class ExcelHandler:
         """
         # Find or create the date column
         date_col_idx = self.find_or_create_date_column(date_str)
-        date_col_letter = self.column_index_to_letter(date_col_idx)
         
-        # Update the prices in the Excel sheet
-        for row_idx, price in results:
-            if price is not None:
-                # Update the DataFrame
-                self.df.loc[row_idx - 2, date_str] = price
-                
-                # Update the Excel cell
-                self.sheet[f"{date_col_letter}{row_idx}"] = price
+        scraped = [(row_idx, price) for row_idx, price in results if price is not None]
+        if not scraped:
+            return
+        
+        excel_rows = np.array([row_idx for row_idx, _ in scraped])
+        prices = np.array([price for _, price in scraped], dtype=np.float64)
+        
+        # Update the DataFrame in a single positional assignment
+        self.df.iloc[excel_rows - 2, date_col_idx] = prices
+        
+        # Update the Excel cells
+        self._cell_updates.update(
+            zip([(row_idx, date_col_idx) for row_idx in excel_rows.tolist()], prices.tolist())
+        )
     
     def calculate_discounts(self, discount_col: str):
         """
@@ -200,63 +524,90 @@ class ExcelHandler:
         # Get the discount column index
         discount_col_idx = self.column_letter_to_index(discount_col)
         
-        # Find the columns containing prices (date columns)
-        date_col_indices = []
-        for col_idx, col_name in enumerate(self.df.columns):
-            try:
-                # Check if the column name is a valid date
-                datetime.strptime(str(col_name), "%Y-%m-%d")
-                date_col_indices.append(col_idx)
-            except (ValueError, TypeError):
-                continue
+        # Order the date columns chronologically so the last one is the latest
+        columns = self.df.columns
+        date_col_indices = sorted(
+            self._date_col_indices, key=lambda col_idx: str(columns[col_idx])
+        )
         
         if not date_col_indices:
             logger.warning("No date columns found, cannot calculate discounts")
             return
         
-        # Calculate average prices and discounts
-        for row_idx, row in self.df.iterrows():
-            # Skip rows without product links
-            if row_idx < 2:  # Skip configuration rows
-                continue
-            
-            # Extract prices from date columns
-            prices = []
-            for col_idx in date_col_indices:
-                price = row.iloc[col_idx]
-                if isinstance(price, (int, float)) and price > 0:
-                    prices.append(price)
-            
-            if not prices:
-                continue
-            
-            # Calculate average price
-            avg_price = sum(prices) / len(prices)
-            
-            # Get the current price (most recent date)
-            current_price = prices[-1] if prices else 0
-            
-            # Calculate discount percentage
-            if avg_price > 0 and current_price > 0:
-                discount_percent = (1 - (current_price / avg_price)) * 100
-            else:
-                discount_percent = 0
-            
-            # Update the discount column in the DataFrame
-            discount_col_name = self.df.columns[discount_col_idx]
-            self.df.loc[row_idx, discount_col_name] = discount_percent
-            
-            # Update the Excel cell
-            excel_row = row_idx + 2  # Adjust for Excel row numbers
-            self.sheet[f"{discount_col}{excel_row}"] = discount_percent
-            
-            # Format positive discounts in green, negative in red
-            cell = self.sheet[f"{discount_col}{excel_row}"]
-            if discount_percent > 0:
-                cell.font = Font(color="00AA00")  # Green
-            elif discount_percent < 0:
-                cell.font = Font(color="AA0000")  # Red
+        # Extract prices from date columns
+        prices = np.ascontiguousarray(
+            self.df.iloc[:, date_col_indices]
+            .apply(pd.to_numeric, errors="coerce")
+            .to_numpy(dtype=np.float64)
+        )
+        
+        # Calculate discounts against the average of the positive prices
+        discounts = np.empty(prices.shape[0], dtype=np.float64)
+        compute_discounts(prices, discounts)
+        
+        # Skip the configuration row and rows without prices
+        rows = np.nonzero(~np.isnan(discounts))[0]
+        rows = rows[rows >= 1]
+        if not rows.size:
+            return
+        
+        discounts = discounts[rows]
+        
+        # Update the discount column in the DataFrame
+        self.df.iloc[rows, discount_col_idx] = discounts
+        
+        # Update the Excel cells
+        excel_rows = rows + 2  # Adjust for Excel row numbers
+        self._cell_updates.update(
+            zip([(excel_row, discount_col_idx) for excel_row in excel_rows.tolist()], discounts.tolist())
+        )
+        
+        # Format positive discounts in green, negative in red
+        for excel_row in excel_rows[discounts > 0].tolist():
+            self._cell_styles[(excel_row, discount_col_idx)] = POSITIVE_DISCOUNT_STYLE
+        for excel_row in excel_rows[discounts < 0].tolist():
+            self._cell_styles[(excel_row, discount_col_idx)] = NEGATIVE_DISCOUNT_STYLE
     
     def save(self):
-        """Save the Excel file."""
-        self.workbook.save(self.filepath)
+        """
+        Save the Excel file.
+        
+        The workbook is written to a temporary file next to the original and
+        then renamed over it, so a failed save never leaves a truncated file.
+        """
+        tmp_path = f"{self.filepath}.tmp"
+        try:
+            ExcelWriter(tmp_path).write(
+                self.sheets,
+                self.active_index,
+                cell_updates=self._cell_updates,
+                cell_styles=self._cell_styles,
+                named_styles=self._named_styles,
+                formulas=self.formulas,
+            )
+            os.replace(tmp_path, self.filepath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def finalize_workbook(
+    excel_handler: "ExcelHandler", results: List[Tuple[int, Optional[float]]], date_str: str, discount_col: str
+):
+    """
+    Write prices and discounts to an Excel file and save it.
+    
+    This is a module-level function so it can be run in a worker process.
+    The handler is passed in with the values it already read, so the file
+    is not parsed a second time.
+    
+    Args:
+        excel_handler: The ExcelHandler the products were read from
+        results: List of tuples containing (row_index, price)
+        date_str: The date string for the column header
+        discount_col: The column letter for storing discount percentages
+    """
+    excel_handler.write_prices(results, date_str)
+    excel_handler.calculate_discounts(discount_col)
+    excel_handler.save()
\ No newline at end of file
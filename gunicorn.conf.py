@@ -0,0 +1,29 @@
+"""
+Gunicorn Configuration
+
+This file configures gunicorn to serve the Shopee price tracker with
+gevent workers, so slow uploads, downloads and status polling don't
+block each other.
+
+Usage: gunicorn -c gunicorn.conf.py main:app
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# gevent turns socket I/O into cooperative greenlets, so one worker can
+# serve many concurrent requests and scraper threads
+worker_class = "gevent"
+worker_connections = 1000
+
+# Without Redis, job status lives in the memory of the worker that started
+# the job, so more than one worker would lose track of running jobs
+if os.environ.get("REDIS_URL"):
+    default_workers = 2 * multiprocessing.cpu_count() + 1
+else:
+    default_workers = 1
+workers = int(os.environ.get("WEB_CONCURRENCY", default_workers))
+
+timeout = 120
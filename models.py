@@ -7,7 +7,7 @@ This module defines the database models for the Shopee Price Tracker application
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text, Index
 from sqlalchemy.orm import relationship
 
 # Initialize SQLAlchemy instance to be used by the Flask app
@@ -76,6 +76,10 @@ class Product(db.Model):
 class PriceHistory(db.Model):
     """Model for storing price history for products."""
     __tablename__ = 'price_history'
+    __table_args__ = (
+        # Price lookups are per product over a date range
+        Index('ix_price_history_product_id_date', 'product_id', 'date'),
+    )
     
     id = Column(Integer, primary_key=True)
     product_id = Column(Integer, ForeignKey('products.id'), nullable=False)
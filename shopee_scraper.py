@@ -5,18 +5,39 @@ This module handles the scraping of product prices from Shopee.
 It includes both regular HTTP request-based scraping and Selenium fallback.
 """
 
+import asyncio
+import importlib.util
 import json
 import logging
-import re
 import time
-from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from datetime import datetime
 from queue import Queue
-from threading import Thread
-from typing import Dict, List, Optional, Tuple, Union
+from threading import RLock, Thread, local
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 from urllib.parse import urlparse, parse_qs
 
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils import SHOPEE_ID_RE, match_shopee_ids
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Async scraping needs httpx with HTTP/2 support (httpx[http2] pulls in h2)
+if httpx is not None and importlib.util.find_spec("h2") is None:
+    httpx = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
@@ -31,58 +52,366 @@ HEADERS = {
 SHOPEE_API_BASE = "https://shopee.vn/api/v4/item/get"
 
 
-class ShopeeScraper:
-    """Class for scraping Shopee product prices."""
+def _new_session(pool_size: int = 1) -> requests.Session:
+    """
+    Create an HTTP session that keeps its connections to Shopee alive.
+    
+    Args:
+        pool_size: Number of connections to keep open per host; a session
+            used by a single thread only ever needs one
+            
+    Returns:
+        A requests.Session with the default headers and retries configured
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    
+    # Retry transient connection failures on the kept-alive connection
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=3, backoff_factor=0.5),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def parse_json(content: bytes) -> Dict:
+    """
+    Decode a JSON response body, using orjson when it is installed.
+    
+    Args:
+        content: The raw response body
+        
+    Returns:
+        The decoded JSON document
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def index_product_data(data: Dict) -> Dict:
+    """
+    Add lookup tables for matching variations and models to product data.
+    
+    Stores "_tier_names", the normalized name of each tier variation,
+    "_opt_maps", one dict per tier variation mapping each normalized option
+    to its index, and "_model_by_tier", mapping tier index tuples (and their
+    prefixes) to the index of the first matching model.
+    
+    Args:
+        data: The product data
+        
+    Returns:
+        The same product data, with the lookup tables added
+    """
+    tier_names = []
+    opt_maps = []
+    # The API sends null for missing fields, so guard each one
+    for variation in data.get("tier_variations") or []:
+        tier_names.append((variation.get("name") or "").lower().strip())
+        opt_map = {}
+        for j, option in enumerate(variation.get("options") or []):
+            opt_map.setdefault((option or "").lower().strip(), j)
+        opt_maps.append(opt_map)
+    
+    model_by_tier = {}
+    for i, model in enumerate(data.get("models") or []):
+        tier_index = tuple((model.get("extinfo") or {}).get("tier_index") or [0])
+        for length in range(1, len(tier_index) + 1):
+            model_by_tier.setdefault(tier_index[:length], i)
+    
+    data["_tier_names"] = tier_names
+    data["_opt_maps"] = opt_maps
+    data["_model_by_tier"] = model_by_tier
+    return data
+
+
+def extract_product_info(url: str) -> Tuple[str, str]:
+    """
+    Extract shop_id and item_id from Shopee product URL.
+    
+    Args:
+        url: The Shopee product URL
+        
+    Returns:
+        Tuple containing shop_id and item_id
+    """
+    ids = match_shopee_ids(url)
+    if ids is not None:
+        return ids
+    
+    # Parse the URL
+    parsed_url = urlparse(url)
+    
+    # Check if it's a Shopee URL
+    if "shopee.vn" not in parsed_url.netloc:
+        raise ValueError("Not a valid Shopee URL")
+    
+    # Extract shop_id and item_id from URL path
+    path_parts = parsed_url.path.strip('/').split('-')
+    
+    # The last part contains the IDs in format i.X.Y where X is shop_id and Y is item_id
+    if len(path_parts) < 1:
+        raise ValueError("Invalid Shopee URL format")
+    
+    id_part = path_parts[-1]
+    id_match = SHOPEE_ID_RE.search(id_part)
+    
+    if id_match:
+        shop_id = id_match.group(1)
+        item_id = id_match.group(2)
+        return shop_id, item_id
+    
+    # If we couldn't extract from the path, try query parameters
+    query_params = parse_qs(parsed_url.query)
+    if 'shopid' in query_params and 'itemid' in query_params:
+        shop_id = query_params['shopid'][0]
+        item_id = query_params['itemid'][0]
+        return shop_id, item_id
+    
+    raise ValueError("Could not extract shop_id and item_id from URL")
+
+
+def _product_request(shop_id: str, item_id: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Build the Shopee API request for a product.
+    
+    Args:
+        shop_id: The shop ID
+        item_id: The item ID
+        
+    Returns:
+        Tuple containing the request URL and query parameters
+    """
+    url = f"{SHOPEE_API_BASE}?itemid={item_id}&shopid={shop_id}"
+    
+    # Add additional parameters required by the API
+    params = {
+        "shop_id": shop_id,
+        "item_id": item_id,
+    }
+    
+    return url, params
+
+
+def _parse_product_response(content: bytes) -> Dict:
+    """
+    Get the product data out of a Shopee API response body.
+    
+    Args:
+        content: The raw response body
+        
+    Returns:
+        Dict containing product data
+    """
+    # Decode the raw bytes directly, skipping the text encoding detection
+    data = parse_json(content)
+    if data.get("error") is not None:
+        raise ValueError(f"API returned error: {data['error']}")
+    
+    # The variation lookup tables are built on first use by get_model_index
+    return data.get("data", {})
+
+
+def find_variation_option_index(data: Dict, variation_name: str, option_value: str) -> int:
+    """
+    Find the index of a variation option.
+    
+    Args:
+        data: The product data
+        variation_name: The name of the variation
+        option_value: The option value to find
+        
+    Returns:
+        Index of the option, or -1 if not found
+    """
+    if not variation_name or not option_value:
+        return -1
+    
+    if "_opt_maps" not in data:
+        index_product_data(data)
+    
+    # Convert to lowercase for case-insensitive comparison
+    variation_name = variation_name.lower().strip()
+    option_value = option_value.lower().strip()
+    
+    for var_name, opt_map in zip(data["_tier_names"], data["_opt_maps"]):
+        # Check if this is the variation we're looking for
+        if var_name == variation_name or var_name in variation_name or variation_name in var_name:
+            option_idx = opt_map.get(option_value)
+            if option_idx is not None:
+                return option_idx
+            
+            # Fall back to partial matching of the option
+            for opt_val, j in opt_map.items():
+                if opt_val in option_value or option_value in opt_val:
+                    return j
+    
+    return -1
+
+
+def _get_option_index(data: Dict, tier: int, option_value: str) -> int:
+    """
+    Find the index of an option of one tier variation.
+    
+    Args:
+        data: The product data, with lookup tables from index_product_data
+        tier: The index of the tier variation
+        option_value: The option value to find
+        
+    Returns:
+        Index of the option, or -1 if not found
+    """
+    option_idx = data["_opt_maps"][tier].get(option_value.lower().strip())
+    if option_idx is not None:
+        return option_idx
+    
+    # Fall back to partial matching of the option name
+    var_name = data["tier_variations"][tier].get("name", "")
+    return find_variation_option_index(data, var_name, option_value)
+
+
+def get_model_index(data: Dict, var1_value: Optional[str], var2_value: Optional[str]) -> int:
+    """
+    Find the model index for the specified variations.
+    
+    Args:
+        data: The product data
+        var1_value: The first variation value
+        var2_value: The second variation value
+        
+    Returns:
+        Index of the model, or 0 if not found
+    """
+    if not var1_value and not var2_value:
+        return 0  # No variations specified, use default model
+    
+    tier_variations = data.get("tier_variations", [])
+    if not tier_variations:
+        return 0
+    
+    if "_model_by_tier" not in data:
+        index_product_data(data)
+    
+    # Get the variation indexes
+    var1_idx = -1
+    var2_idx = -1
+    
+    if var1_value:
+        var1_idx = _get_option_index(data, 0, var1_value)
+    
+    if var2_value and len(tier_variations) > 1:
+        var2_idx = _get_option_index(data, 1, var2_value)
+    
+    if var1_idx < 0:
+        return 0
+    
+    # Find the matching model, or return the first one if none matches
+    key = (var1_idx, var2_idx) if var2_idx >= 0 else (var1_idx,)
+    return data["_model_by_tier"].get(key, 0)
+
+
+def get_model_price(data: Dict, var1: Optional[str], var2: Optional[str]) -> float:
+    """
+    Get the price of the model matching the specified variations.
+    
+    Args:
+        data: The product data
+        var1: First variation option (optional)
+        var2: Second variation option (optional)
+        
+    Returns:
+        Price of the model as a float
+    """
+    # Find the model with matching variations
+    model_idx = get_model_index(data, var1, var2)
+    
+    # Get the price from the model
+    models = data.get("models", [])
+    if not models:
+        raise ValueError("No models found in product data")
+    
+    model = models[model_idx]
+    
+    # Price is stored in cents, convert to actual price
+    return model.get("price", 0) / 100000
+
+
+class ProductDataCache:
+    """Thread-safe cache of API payloads for one run, keyed by (shop_id, item_id)."""
     
     def __init__(self):
-        """Initialize the scraper with session and required fields."""
-        self.session = requests.Session()
-        self.session.headers.update(HEADERS)
+        """Initialize the product data cache."""
+        self._lock = RLock()
+        self._futures: Dict[Tuple[str, str], Future] = {}
     
-    def extract_product_info(self, url: str) -> Tuple[str, str]:
+    def get_or_fetch(self, key: Tuple[str, str], fetch: Callable[[], Dict]) -> Dict:
         """
-        Extract shop_id and item_id from Shopee product URL.
+        Get cached product data, fetching it if no thread has done so yet.
+        
+        Concurrent lookups of the same product wait for the first fetch
+        instead of issuing their own request. Failed fetches are not cached.
         
         Args:
-            url: The Shopee product URL
+            key: Tuple containing (shop_id, item_id)
+            fetch: Called without arguments to fetch the product data
             
         Returns:
-            Tuple containing shop_id and item_id
+            Dict containing product data
         """
-        # Parse the URL
-        parsed_url = urlparse(url)
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._futures[key] = future
         
-        # Check if it's a Shopee URL
-        if "shopee.vn" not in parsed_url.netloc:
-            raise ValueError("Not a valid Shopee URL")
+        if not owner:
+            return future.result()
         
-        # Extract shop_id and item_id from URL path
-        path_parts = parsed_url.path.strip('/').split('-')
-        
-        # The last part contains the IDs in format i.X.Y where X is shop_id and Y is item_id
-        if len(path_parts) < 1:
-            raise ValueError("Invalid Shopee URL format")
-        
-        id_part = path_parts[-1]
-        id_match = re.search(r'i\.(\d+)\.(\d+)', id_part)
+        try:
+            data = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._futures[key]
+            future.set_exception(e)
+            raise
         
-        if id_match:
-            shop_id = id_match.group(1)
-            item_id = id_match.group(2)
-            return shop_id, item_id
+        future.set_result(data)
+        return data
+
+
+class ShopeeScraper:
+    """Class for scraping Shopee product prices."""
+    
+    def __init__(self, data_cache: Optional[ProductDataCache] = None):
+        """
+        Initialize the scraper with session and required fields.
         
-        # If we couldn't extract from the path, try query parameters
-        query_params = parse_qs(parsed_url.query)
-        if 'shopid' in query_params and 'itemid' in query_params:
-            shop_id = query_params['shopid'][0]
-            item_id = query_params['itemid'][0]
-            return shop_id, item_id
+        Args:
+            data_cache: Cache of product data shared with other scrapers (optional)
+        """
+        self.session = _new_session()
+        self.data_cache = data_cache
+    
+    def extract_product_info(self, url: str) -> Tuple[str, str]:
+        """
+        Extract shop_id and item_id from Shopee product URL.
         
-        raise ValueError("Could not extract shop_id and item_id from URL")
+        Args:
+            url: The Shopee product URL
+            
+        Returns:
+            Tuple containing shop_id and item_id
+        """
+        return extract_product_info(url)
     
     def get_product_data(self, shop_id: str, item_id: str) -> Dict:
         """
-        Get product data from Shopee API.
+        Get product data from Shopee API, reusing the payload of earlier lookups.
         
         Args:
             shop_id: The shop ID
@@ -91,22 +420,30 @@ class ShopeeScraper:
         Returns:
             Dict containing product data
         """
-        url = f"{SHOPEE_API_BASE}?itemid={item_id}&shopid={shop_id}"
+        if self.data_cache is None:
+            return self._fetch_product_data(shop_id, item_id)
         
-        # Add additional parameters required by the API
-        params = {
-            "shop_id": shop_id,
-            "item_id": item_id,
-        }
+        return self.data_cache.get_or_fetch(
+            (shop_id, item_id), lambda: self._fetch_product_data(shop_id, item_id)
+        )
+    
+    def _fetch_product_data(self, shop_id: str, item_id: str) -> Dict:
+        """
+        Fetch product data from Shopee API.
+        
+        Args:
+            shop_id: The shop ID
+            item_id: The item ID
+            
+        Returns:
+            Dict containing product data
+        """
+        url, params = _product_request(shop_id, item_id)
         
         response = self.session.get(url, params=params)
         response.raise_for_status()
         
-        data = response.json()
-        if data.get("error") is not None:
-            raise ValueError(f"API returned error: {data['error']}")
-        
-        return data.get("data", {})
+        return _parse_product_response(response.content)
     
     def find_variation_option_index(self, data: Dict, variation_name: str, option_value: str) -> int:
         """
@@ -120,28 +457,7 @@ class ShopeeScraper:
         Returns:
             Index of the option, or -1 if not found
         """
-        if not variation_name or not option_value:
-            return -1
-        
-        # Convert to lowercase for case-insensitive comparison
-        variation_name = variation_name.lower().strip()
-        option_value = option_value.lower().strip()
-        
-        tier_variations = data.get("tier_variations", [])
-        
-        for i, variation in enumerate(tier_variations):
-            var_name = variation.get("name", "").lower().strip()
-            
-            # Check if this is the variation we're looking for
-            if var_name == variation_name or var_name in variation_name or variation_name in var_name:
-                options = variation.get("options", [])
-                
-                for j, option in enumerate(options):
-                    opt_val = option.lower().strip()
-                    if opt_val == option_value or opt_val in option_value or option_value in opt_val:
-                        return j
-        
-        return -1
+        return find_variation_option_index(data, variation_name, option_value)
     
     def get_model_index(self, data: Dict, var1_value: Optional[str], var2_value: Optional[str]) -> int:
         """
@@ -155,40 +471,7 @@ class ShopeeScraper:
         Returns:
             Index of the model, or 0 if not found
         """
-        if not var1_value and not var2_value:
-            return 0  # No variations specified, use default model
-        
-        tier_variations = data.get("tier_variations", [])
-        if not tier_variations:
-            return 0
-        
-        # Get the variation indexes
-        var1_idx = -1
-        var2_idx = -1
-        
-        if var1_value and len(tier_variations) > 0:
-            var1_name = tier_variations[0].get("name", "")
-            var1_idx = self.find_variation_option_index(data, var1_name, var1_value)
-        
-        if var2_value and len(tier_variations) > 1:
-            var2_name = tier_variations[1].get("name", "")
-            var2_idx = self.find_variation_option_index(data, var2_name, var2_value)
-        
-        # Find the matching model
-        models = data.get("models", [])
-        for i, model in enumerate(models):
-            # For single variation
-            if var1_idx >= 0 and var2_idx < 0:
-                if model.get("extinfo", {}).get("tier_index", [0])[0] == var1_idx:
-                    return i
-            # For double variation
-            elif var1_idx >= 0 and var2_idx >= 0:
-                tier_index = model.get("extinfo", {}).get("tier_index", [0, 0])
-                if len(tier_index) >= 2 and tier_index[0] == var1_idx and tier_index[1] == var2_idx:
-                    return i
-        
-        # If no matching model found, return the first one
-        return 0
+        return get_model_index(data, var1_value, var2_value)
     
     def get_price(self, url: str, var1: Optional[str] = None, var2: Optional[str] = None) -> float:
         """
@@ -204,30 +487,159 @@ class ShopeeScraper:
         """
         try:
             # Extract shop_id and item_id from URL
-            shop_id, item_id = self.extract_product_info(url)
+            shop_id, item_id = extract_product_info(url)
             
             # Get product data
             data = self.get_product_data(shop_id, item_id)
             
-            # Find the model with matching variations
-            model_idx = self.get_model_index(data, var1, var2)
-            
-            # Get the price from the model
-            models = data.get("models", [])
-            if not models:
-                raise ValueError("No models found in product data")
+            return get_model_price(data, var1, var2)
+        except Exception as e:
+            logger.error(f"Error scraping price from {url}: {e}")
+            raise
+
+
+class AsyncShopeeScraper:
+    """Scraper issuing its API requests through a shared httpx.AsyncClient."""
+    
+    def __init__(self, client: "httpx.AsyncClient"):
+        """
+        Initialize the scraper with the client every request is sent through.
+        
+        Args:
+            client: The async HTTP client
+        """
+        self.client = client
+        self._data_tasks: Dict[Tuple[str, str], "asyncio.Task"] = {}
+    
+    async def get_product_data_async(self, shop_id: str, item_id: str) -> Dict:
+        """
+        Get product data from Shopee API, reusing the payload of earlier lookups.
+        
+        Args:
+            shop_id: The shop ID
+            item_id: The item ID
             
-            model = models[model_idx]
+        Returns:
+            Dict containing product data
+        """
+        key = (shop_id, item_id)
+        task = self._data_tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_product_data_async(shop_id, item_id))
+            self._data_tasks[key] = task
+            task.add_done_callback(lambda done: self._forget_failed_task(key, done))
+        
+        return await asyncio.shield(task)
+    
+    def _forget_failed_task(self, key: Tuple[str, str], task: "asyncio.Task"):
+        """
+        Drop a failed fetch so later lookups of the product retry it.
+        
+        Args:
+            key: Tuple containing (shop_id, item_id)
+            task: The finished fetch task
+        """
+        if task.cancelled() or task.exception() is not None:
+            self._data_tasks.pop(key, None)
+    
+    async def _fetch_product_data_async(self, shop_id: str, item_id: str) -> Dict:
+        """
+        Fetch product data from Shopee API without blocking the event loop.
+        
+        Args:
+            shop_id: The shop ID
+            item_id: The item ID
             
-            # Price is stored in cents, convert to actual price
-            price = model.get("price", 0) / 100000
+        Returns:
+            Dict containing product data
+        """
+        url, params = _product_request(shop_id, item_id)
+        
+        response = await self.client.get(url, params=params)
+        response.raise_for_status()
+        
+        return _parse_product_response(response.content)
+    
+    async def get_price_async(self, url: str, var1: Optional[str] = None, var2: Optional[str] = None) -> float:
+        """
+        Get the price of a product from Shopee without blocking the event loop.
+        
+        Args:
+            url: The Shopee product URL
+            var1: First variation option (optional)
+            var2: Second variation option (optional)
             
-            return price
+        Returns:
+            Price of the product as a float
+        """
+        try:
+            shop_id, item_id = extract_product_info(url)
+            data = await self.get_product_data_async(shop_id, item_id)
+            return get_model_price(data, var1, var2)
         except Exception as e:
             logger.error(f"Error scraping price from {url}: {e}")
             raise
 
 
+class PriceCache:
+    """Thread-safe cache of scraped prices, valid until the end of the day."""
+    
+    def __init__(self, maxsize: int = 8192):
+        """
+        Initialize the price cache.
+        
+        Args:
+            maxsize: Maximum number of prices to keep
+        """
+        self.maxsize = maxsize
+        self._lock = RLock()
+        self._date = None
+        self._prices: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+    
+    def _expire(self):
+        """Drop every cached price if the day has changed since it was stored."""
+        today = datetime.now().strftime("%Y-%m-%d")
+        if self._date != today:
+            self._prices.clear()
+            self._date = today
+    
+    def get(self, key: Tuple[str, str, str]) -> Optional[float]:
+        """
+        Get a cached price.
+        
+        Args:
+            key: Tuple containing (url, var1, var2)
+            
+        Returns:
+            The cached price, or None if not cached today
+        """
+        with self._lock:
+            self._expire()
+            price = self._prices.get(key)
+            if price is not None:
+                self._prices.move_to_end(key)
+            return price
+    
+    def set(self, key: Tuple[str, str, str], price: float):
+        """
+        Store a price in the cache.
+        
+        Args:
+            key: Tuple containing (url, var1, var2)
+            price: The scraped price
+        """
+        with self._lock:
+            self._expire()
+            self._prices[key] = price
+            self._prices.move_to_end(key)
+            while len(self._prices) > self.maxsize:
+                self._prices.popitem(last=False)
+
+
+# Shared by every pool so repeated jobs on the same day skip the network
+price_cache = PriceCache()
+
+
 class ShopeeScraperPool:
     """Thread pool for scraping multiple products concurrently."""
     
@@ -240,6 +652,66 @@ class ShopeeScraperPool:
         """
         self.max_workers = max_workers
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        
+        # One scraper (and thus one keep-alive session) per worker thread
+        self._local = local()
+        self.data_cache = ProductDataCache()
+        self._scrapers: List[ShopeeScraper] = []
+        self._scrapers_lock = RLock()
+    
+    def submit(self, url: str, var1: Optional[str] = None, var2: Optional[str] = None) -> Future:
+        """
+        Schedule a price lookup on the thread pool without waiting for it.
+        
+        Args:
+            url: The Shopee product URL
+            var1: First variation option (optional)
+            var2: Second variation option (optional)
+            
+        Returns:
+            Future resolving to the price of the product as a float
+        """
+        key = (url, var1 or "", var2 or "")
+        
+        price = price_cache.get(key)
+        if price is not None:
+            future = Future()
+            future.set_result(price)
+            return future
+        
+        return self.executor.submit(self._scrape_price, key, url, var1, var2)
+    
+    def _get_scraper(self) -> ShopeeScraper:
+        """
+        Get the scraper of the current worker thread.
+        
+        Returns:
+            The ShopeeScraper reused by every lookup on this thread
+        """
+        scraper = getattr(self._local, "scraper", None)
+        if scraper is None:
+            scraper = ShopeeScraper(self.data_cache)
+            self._local.scraper = scraper
+            with self._scrapers_lock:
+                self._scrapers.append(scraper)
+        return scraper
+    
+    def _scrape_price(self, key: Tuple[str, str, str], url: str, var1: Optional[str], var2: Optional[str]) -> float:
+        """
+        Scrape the price of a product and store it in the price cache.
+        
+        Args:
+            key: The price cache key
+            url: The Shopee product URL
+            var1: First variation option (optional)
+            var2: Second variation option (optional)
+            
+        Returns:
+            Price of the product as a float
+        """
+        price = self._get_scraper().get_price(url, var1, var2)
+        price_cache.set(key, price)
+        return price
     
     def get_price(self, url: str, var1: Optional[str] = None, var2: Optional[str] = None) -> float:
         """
@@ -253,10 +725,87 @@ class ShopeeScraperPool:
         Returns:
             Price of the product as a float
         """
-        scraper = ShopeeScraper()
-        future = self.executor.submit(scraper.get_price, url, var1, var2)
-        return future.result()
+        return self.submit(url, var1, var2).result()
+    
+    def get_prices_batch(
+        self, tasks: List[Tuple[int, str, Optional[str], Optional[str]]]
+    ) -> Iterator[Tuple[int, Union[float, Exception]]]:
+        """
+        Scrape many products concurrently, yielding each price as it completes.
+        
+        Args:
+            tasks: List of tuples containing (index, url, var1, var2)
+            
+        Yields:
+            Tuples containing (index, price), or (index, exception) if the
+            lookup failed
+        """
+        futures = {
+            self.submit(url, var1, var2): idx
+            for idx, url, var1, var2 in tasks
+        }
+        
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                yield idx, future.result()
+            except Exception as e:
+                yield idx, e
     
     def shutdown(self):
-        """Shutdown the thread pool."""
+        """Shutdown the thread pool and close the HTTP sessions."""
         self.executor.shutdown(wait=True)
+        
+        with self._scrapers_lock:
+            for scraper in self._scrapers:
+                scraper.session.close()
+            self._scrapers.clear()
+
+
+async def scrape_prices_async(
+    tasks: List[Tuple[int, str, Optional[str], Optional[str]]],
+    concurrency: int = 32,
+    callback: Optional[Callable[[int, Union[float, Exception]], None]] = None,
+) -> List[Tuple[int, Union[float, Exception]]]:
+    """
+    Scrape many products concurrently on a single thread with asyncio.
+    
+    Args:
+        tasks: List of tuples containing (index, url, var1, var2)
+        concurrency: Maximum number of requests in flight at once
+        callback: Called with (index, price_or_exception) as each lookup completes
+        
+    Returns:
+        List of tuples containing (index, price), or (index, exception) if
+        the lookup failed, in the order of the tasks
+    """
+    if httpx is None:
+        raise RuntimeError("httpx[http2] is required for async scraping")
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def scrape(scraper, idx, url, var1, var2):
+        key = (url, var1 or "", var2 or "")
+        try:
+            price = price_cache.get(key)
+            if price is None:
+                async with semaphore:
+                    price = await scraper.get_price_async(url, var1, var2)
+                price_cache.set(key, price)
+        except Exception as e:
+            price = e
+        if callback is not None:
+            callback(idx, price)
+        return idx, price
+    
+    # HTTP/2 forbids connection-specific headers; its connections persist anyway
+    headers = {name: value for name, value in HEADERS.items() if name != "Connection"}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    # Retry failed connections like the Retry(total=3) of the sync sessions
+    transport = httpx.AsyncHTTPTransport(http2=True, limits=limits, retries=3)
+    async with httpx.AsyncClient(headers=headers, transport=transport) as client:
+        scraper = AsyncShopeeScraper(client)
+        return await asyncio.gather(*[
+            scrape(scraper, idx, url, var1, var2)
+            for idx, url, var1, var2 in tasks
+        ])
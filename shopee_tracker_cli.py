@@ -7,6 +7,7 @@ and calculates discount percentages compared to the average price.
 """
 
 import argparse
+import asyncio
 import logging
 import os
 import sys
@@ -17,7 +18,7 @@ from tqdm import tqdm
 
 from config import load_config_from_excel, Config
 from excel_handler import ExcelHandler
-from shopee_scraper import ShopeeScraperPool
+from shopee_scraper import ShopeeScraperPool, httpx, scrape_prices_async
 # No need to import app from app.py here anymore
 
 logging.basicConfig(
@@ -41,6 +42,13 @@ def parse_args():
         default=4,
         help='Number of threads for scraping (default: 4)'
     )
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help='Scrape with asyncio and httpx instead of the thread pool '
+             '(runs up to 8 requests per thread concurrently)'
+    )
     parser.add_argument(
         '--debug',
         action='store_true',
@@ -89,35 +97,45 @@ def main():
         logger.error(f"Failed to get product links: {e}")
         sys.exit(1)
     
-    if not products:
+    if products.empty:
         logger.error("No products found in the Excel file")
         sys.exit(1)
 
     # Current date for the column header
     today = datetime.now().strftime("%Y-%m-%d")
     
-    # Initialize the scraper pool
-    scraper_pool = ShopeeScraperPool(args.threads)
+    if args.use_async and httpx is None:
+        logger.warning("httpx[http2] is not installed, falling back to the thread pool")
+        args.use_async = False
     
     # Scrape prices
-    logger.info(f"Starting price scraping with {args.threads} threads")
+    if args.use_async:
+        logger.info(f"Starting async price scraping with {args.threads * 8} concurrent requests")
+    else:
+        logger.info(f"Starting price scraping with {args.threads} threads")
     start_time = time.time()
     
+    tasks = list(products[['row', 'link', 'var1', 'var2']].itertuples(index=False, name=None))
+    links = dict(zip(products['row'], products['link']))
+    
     results = []
-    with tqdm(total=len(products), desc="Scraping prices", unit="product") as pbar:
-        for i, (index, product) in enumerate(products.items()):
-            link = product['link']
-            var1 = product['var1']
-            var2 = product['var2']
-            
+    with tqdm(total=len(tasks), desc="Scraping prices", unit="product") as pbar:
+        def record(row, price):
+            if isinstance(price, Exception):
+                logger.error(f"Failed to scrape price for {links[row]}: {price}")
+                price = None
+            results.append((row, price))
+            pbar.update(1)
+        
+        if args.use_async:
+            asyncio.run(scrape_prices_async(tasks, args.threads * 8, callback=record))
+        else:
+            scraper_pool = ShopeeScraperPool(args.threads)
             try:
-                price = scraper_pool.get_price(link, var1, var2)
-                results.append((index, price))
-                pbar.update(1)
-            except Exception as e:
-                logger.error(f"Failed to scrape price for {link}: {e}")
-                results.append((index, None))
-                pbar.update(1)
+                for row, price in scraper_pool.get_prices_batch(tasks):
+                    record(row, price)
+            finally:
+                scraper_pool.shutdown()
     
     elapsed_time = time.time() - start_time
     logger.info(f"Scraping completed in {elapsed_time:.2f} seconds")
@@ -0,0 +1,84 @@
+"""
+Tests for saving workbooks with excel_handler.
+"""
+
+import os
+import tempfile
+import unittest
+
+import openpyxl
+
+from excel_handler import (
+    NEGATIVE_DISCOUNT_STYLE,
+    POSITIVE_DISCOUNT_STYLE,
+    ExcelHandler,
+    finalize_workbook,
+)
+
+
+def make_workbook(filepath):
+    """Create a tracking sheet after a notes sheet, with the tracking sheet active."""
+    workbook = openpyxl.Workbook()
+    notes = workbook.active
+    notes.title = "Notes"
+    notes["A1"] = 2
+    notes["A2"] = "=A1*2"
+
+    sheet = workbook.create_sheet("Products")
+    sheet.append(["Link", "Phân loại 1", "Phân loại 2", "% Giảm giá", "2025-04-16", "Gấp đôi"])
+    sheet.append(["config"])
+    sheet.append(["https://shopee.vn/a-i.1.2", "S", None, None, 100, "=E3*2"])
+    sheet.append(["https://shopee.vn/b-i.1.3", "M", None, None, 200, "=E4*2"])
+
+    workbook.active = 1
+    workbook.save(filepath)
+
+
+class SaveRoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.filepath = os.path.join(folder.name, "products.xlsx")
+        make_workbook(self.filepath)
+
+    def test_save_keeps_workbook_and_writes_updates(self):
+        handler = ExcelHandler(self.filepath)
+        finalize_workbook(handler, [(3, 50.0), (4, 300.0)], "2025-04-17", "D")
+
+        workbook = openpyxl.load_workbook(self.filepath)
+        self.assertEqual(workbook.sheetnames, ["Notes", "Products"])
+        self.assertEqual(workbook.active.title, "Products")
+
+        notes = workbook["Notes"]
+        self.assertEqual(notes["A1"].value, 2)
+        self.assertEqual(notes["A2"].value, "=A1*2")
+
+        sheet = workbook["Products"]
+        self.assertEqual(sheet["F3"].value, "=E3*2")
+        self.assertEqual(sheet["F4"].value, "=E4*2")
+        self.assertEqual(sheet["G1"].value, "2025-04-17")
+        self.assertEqual(sheet["G3"].value, 50)
+        self.assertEqual(sheet["G4"].value, 300)
+
+        # 50 against an average of 75, 300 against an average of 250
+        self.assertAlmostEqual(sheet["D3"].value, 100 / 3)
+        self.assertEqual(sheet["D3"].style, POSITIVE_DISCOUNT_STYLE)
+        self.assertAlmostEqual(sheet["D4"].value, -20)
+        self.assertEqual(sheet["D4"].style, NEGATIVE_DISCOUNT_STYLE)
+
+    def test_saved_file_loads_again(self):
+        finalize_workbook(ExcelHandler(self.filepath), [(3, 50.0), (4, 300.0)], "2025-04-17", "D")
+
+        handler = ExcelHandler(self.filepath)
+        self.assertEqual(handler.active_index, 1)
+        self.assertEqual(handler.formulas[0], {(2, 0): "=A1*2"})
+        self.assertEqual(handler.formulas[1], {(3, 5): "=E3*2", (4, 5): "=E4*2"})
+
+        products = handler.get_product_links_and_variations("A", "B", "C")
+        self.assertEqual(products["row"].tolist(), [3, 4])
+        self.assertEqual(products["var1"].tolist(), ["S", "M"])
+
+
+if __name__ == "__main__":
+    unittest.main()
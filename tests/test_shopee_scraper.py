@@ -0,0 +1,73 @@
+"""
+Tests for the variation matching in shopee_scraper.
+"""
+
+import unittest
+
+from shopee_scraper import find_variation_option_index, get_model_index, get_model_price
+
+
+def make_product_data():
+    """Build product data shaped like the Shopee API response."""
+    return {
+        "tier_variations": [
+            {"name": "Size", "options": ["XS", "S", "M"]},
+            {"name": "Dung lượng", "options": ["128GB", "256GB"]},
+        ],
+        "models": [
+            {"extinfo": {"tier_index": [i, j]}, "price": (i * 10 + j + 1) * 100000}
+            for i in range(3)
+            for j in range(2)
+        ],
+    }
+
+
+class FindVariationOptionIndexTest(unittest.TestCase):
+
+    def test_exact_match_wins_over_earlier_partial_match(self):
+        # "s" is contained in "xs", but the exact option must be picked
+        data = make_product_data()
+        self.assertEqual(find_variation_option_index(data, "Size", "S"), 1)
+        self.assertEqual(find_variation_option_index(data, "size", " xs "), 0)
+
+    def test_partial_match_is_used_without_exact_match(self):
+        data = make_product_data()
+        self.assertEqual(find_variation_option_index(data, "Dung lượng", "256"), 1)
+
+    def test_unknown_option(self):
+        data = make_product_data()
+        self.assertEqual(find_variation_option_index(data, "Size", "XL"), -1)
+        self.assertEqual(find_variation_option_index(data, "Màu", "S"), -1)
+
+
+class GetModelIndexTest(unittest.TestCase):
+
+    def test_exact_match_selects_model(self):
+        data = make_product_data()
+        self.assertEqual(get_model_index(data, "S", "128GB"), 2)
+        self.assertEqual(get_model_price(data, "S", "128GB"), 11)
+
+    def test_partial_match_selects_model(self):
+        data = make_product_data()
+        self.assertEqual(get_model_index(data, "M", "256"), 5)
+
+    def test_no_match_falls_back_to_first_model(self):
+        data = make_product_data()
+        self.assertEqual(get_model_index(data, "XL", None), 0)
+        self.assertEqual(get_model_index(data, None, None), 0)
+
+    def test_null_fields_fall_back_to_first_model(self):
+        # The API sends null instead of leaving fields out
+        data = {"tier_variations": None, "models": [{"price": 500000}]}
+        self.assertEqual(get_model_price(data, "S", None), 5)
+
+        data = {
+            "tier_variations": [{"name": None, "options": None}, {"name": "Màu", "options": ["Đỏ"]}],
+            "models": [{"extinfo": None, "price": 500000}, {"extinfo": {"tier_index": None}}],
+        }
+        self.assertEqual(get_model_index(data, "S", "Đỏ"), 0)
+        self.assertEqual(find_variation_option_index(data, "Màu", "đỏ"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,8 +9,48 @@ import re
 from typing import Dict, Optional, Tuple
 from urllib.parse import urlparse, parse_qs
 
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    # Without numba the functions below run as plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+    
+    prange = range
+
 logger = logging.getLogger(__name__)
 
+# Product IDs at the end of a Shopee URL path, in format i.<shop_id>.<item_id>
+SHOPEE_ID_RE = re.compile(r'i\.(\d+)\.(\d+)')
+
+
+def match_shopee_ids(url: str) -> Optional[Tuple[str, str]]:
+    """
+    Extract shop_id and item_id from a URL in the common form.
+    
+    Handles https://shopee.vn/<name>-i.<shop_id>.<item_id> URLs without
+    urlparse; other forms are left to the full parsers.
+    
+    Args:
+        url: The Shopee product URL
+        
+    Returns:
+        Tuple of (shop_id, item_id), or None if the URL is not in that form
+    """
+    _, sep, rest = url.partition("://")
+    netloc, _, path = rest.partition("/")
+    if sep and "shopee.vn" in netloc and "?" not in netloc and "#" not in netloc:
+        path = path.partition("?")[0].partition("#")[0]
+        id_match = SHOPEE_ID_RE.search(path.strip('/').rsplit('-', 1)[-1])
+        if id_match:
+            return id_match.group(1), id_match.group(2)
+    
+    return None
+
 
 def extract_shopee_ids(url: str) -> Tuple[Optional[str], Optional[str]]:
     """
@@ -26,6 +66,10 @@ def extract_shopee_ids(url: str) -> Tuple[Optional[str], Optional[str]]:
         return None, None
     
     try:
+        ids = match_shopee_ids(url)
+        if ids is not None:
+            return ids
+        
         # Parse the URL
         parsed_url = urlparse(url)
         
@@ -40,7 +84,7 @@ def extract_shopee_ids(url: str) -> Tuple[Optional[str], Optional[str]]:
         # Last part might contain the IDs in format i.X.Y
         if len(path_parts) >= 1:
             id_part = path_parts[-1]
-            id_match = re.search(r'i\.(\d+)\.(\d+)', id_part)
+            id_match = SHOPEE_ID_RE.search(id_part)
             
             if id_match:
                 shop_id = id_match.group(1)
@@ -75,6 +119,7 @@ def format_price(price: float) -> str:
     return f"{price:,.0f}"
 
 
+@njit(cache=True)
 def calculate_discount_percent(current_price: float, avg_price: float) -> float:
     """
     Calculate discount percentage compared to average price.
@@ -89,6 +134,37 @@ def calculate_discount_percent(current_price: float, avg_price: float) -> float:
         Discount percentage
     """
     if avg_price <= 0 or current_price <= 0:
-        return 0
+        return 0.0
     
     return (1 - (current_price / avg_price)) * 100
+
+
+@njit(cache=True, parallel=True)
+def compute_discounts(prices: np.ndarray, out: np.ndarray):
+    """
+    Calculate the discount percentage of every product in one call.
+    
+    Each row holds the prices of one product in chronological order; only
+    positive prices count. The current price is the last positive one and
+    the discount is taken against the average of all positive ones.
+    
+    Args:
+        prices: 2D float64 array with one row per product, one column per date
+        out: 1D float64 array receiving the discount of each row, or NaN for
+            rows without any price
+    """
+    for i in prange(prices.shape[0]):
+        total = 0.0
+        count = 0
+        current = 0.0
+        for j in range(prices.shape[1]):
+            price = prices[i, j]
+            if price > 0:
+                total += price
+                count += 1
+                current = price
+        
+        if count:
+            out[i] = calculate_discount_percent(current, total / count)
+        else:
+            out[i] = np.nan